@@ -1,41 +1,67 @@
 import json
+import logging
 import boto3
+from botocore.config import Config
 import os
-from datetime import datetime
-from opensearchpy import OpenSearch, RequestsHttpConnection
-from requests_aws4auth import AWS4Auth
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from opensearchpy import AWSV4SignerAuth, OpenSearch, RequestsHttpConnection, helpers
+
+# Logging; payload dumps are DEBUG so they are skipped unless LOG_LEVEL enables them
+logger = logging.getLogger()
+_log_level = logging.getLevelName(os.environ.get('LOG_LEVEL', 'INFO').upper())
+# getLevelName returns a string for unknown names; fall back to INFO
+logger.setLevel(_log_level if isinstance(_log_level, int) else logging.INFO)
+
+# Shared botocore config: keep sockets alive and allow enough pooled
+# connections for bursty invocations
+_CFG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=50,
+    retries={'mode': 'standard', 'max_attempts': 3},
+    connect_timeout=2,
+    read_timeout=10
+)
 
 # Initialize AWS clients
-s3_client = boto3.client('s3')
-rekognition_client = boto3.client('rekognition')
+s3_client = boto3.client('s3', config=_CFG)
+rekognition_client = boto3.client('rekognition', config=_CFG)
 
 # OpenSearch configuration
 OPENSEARCH_HOST = os.environ.get('OPENSEARCH_HOST')
 OPENSEARCH_REGION = os.environ.get('AWS_REGION', 'us-east-1')
 INDEX_NAME = 'photos'
 
-def get_opensearch_client():
-    """Create and return OpenSearch client with AWS IAM Authentication"""
-    
-    # Get AWS credentials from Lambda execution role
-    credentials = boto3.Session().get_credentials()
-    awsauth = AWS4Auth(
-        credentials.access_key,
-        credentials.secret_key,
-        OPENSEARCH_REGION,
-        'es',
-        session_token=credentials.token
-    )
-    
-    opensearch_client = OpenSearch(
-        hosts=[{'host': OPENSEARCH_HOST, 'port': 443}],
-        http_auth=awsauth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=30
-    )
-    return opensearch_client
+# Rekognition limits; fewer, higher-confidence labels keep detect_labels fast
+REKOGNITION_MAX_LABELS = int(os.environ.get('REK_MAX_LABELS', '5'))
+REKOGNITION_MIN_CONFIDENCE = float(os.environ.get('REK_MIN_CONFIDENCE', '80'))
+
+# Worker threads for overlapping Rekognition and S3 calls across records
+MAX_WORKERS = 4
+
+# Separator for the comma-separated customlabels metadata value
+_LABEL_SPLIT_RE = re.compile(r'\s*,\s*')
+
+# Extracts the Name field from each Rekognition label
+_LABEL_NAME = itemgetter('Name')
+
+# Build the OpenSearch client once per execution environment so warm
+# invocations reuse the signer, credential chain and connection pool.
+# AWSV4SignerAuth signs with botocore and re-reads rotated role credentials.
+_CREDENTIALS = boto3.Session().get_credentials()
+_AWSAUTH = AWSV4SignerAuth(_CREDENTIALS, OPENSEARCH_REGION, 'es')
+
+_OS_CLIENT = OpenSearch(
+    hosts=[{'host': OPENSEARCH_HOST, 'port': 443}],
+    http_auth=_AWSAUTH,
+    use_ssl=True,
+    verify_certs=True,
+    connection_class=RequestsHttpConnection,
+    pool_maxsize=32,
+    timeout=30
+)
 
 def lambda_handler(event, context):
     """
@@ -49,51 +75,73 @@ def lambda_handler(event, context):
     5. Index in OpenSearch
     """
     
-    print(f"Received event: {json.dumps(event)}")
+    logger.debug("Received event: %s", event)
     
     try:
         # Extract bucket and object key from S3 event
-        for record in event['Records']:
-            bucket = record['s3']['bucket']['name']
-            key = record['s3']['object']['key']
-            
-            print(f"Processing file: {key} from bucket: {bucket}")
-            
-            # Step 1: Detect labels using Rekognition
-            labels = detect_labels(bucket, key)
-            print(f"Rekognition detected labels: {labels}")
-            
-            # Step 2: Retrieve custom labels from S3 metadata
-            custom_labels = get_custom_labels(bucket, key)
-            print(f"Custom labels from metadata: {custom_labels}")
-            
-            # Step 3: Combine all labels
-            all_labels = labels + custom_labels
-            print(f"All labels combined: {all_labels}")
-            
-            # Step 4: Create JSON object for OpenSearch
-            created_timestamp = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
-            photo_document = {
-                'objectKey': key,
-                'bucket': bucket,
-                'createdTimestamp': created_timestamp,
-                'labels': all_labels
-            }
-            
-            print(f"Photo document to index: {json.dumps(photo_document)}")
-            
-            # Step 5: Index in OpenSearch
-            index_photo(photo_document)
-            
-            print(f"Successfully indexed {key}")
+        records = [
+            (record['s3']['bucket']['name'], record['s3']['object']['key'])
+            for record in event['Records']
+        ]
+        
+        # All records in one S3 notification share a single UTC timestamp
+        created_timestamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime())
+        photo_documents = []
+        
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            # Steps 1-2: Rekognition and HeadObject are independent, so start
+            # both lookups for every record before waiting on any of them
+            lookups = [
+                (
+                    bucket,
+                    key,
+                    executor.submit(detect_labels, bucket, key),
+                    executor.submit(get_custom_labels, bucket, key)
+                )
+                for bucket, key in records
+            ]
             
+            for bucket, key, labels_future, custom_labels_future in lookups:
+                logger.info("Processing file: %s from bucket: %s", key, bucket)
+                
+                labels = labels_future.result()
+                logger.debug("Rekognition detected labels: %s", labels)
+                
+                custom_labels = custom_labels_future.result()
+                logger.debug("Custom labels from metadata: %s", custom_labels)
+                
+                # Step 3: Combine all labels
+                all_labels = labels + custom_labels
+                logger.debug("All labels combined: %s", all_labels)
+                
+                # Step 4: Create JSON object for OpenSearch
+                photo_document = {
+                    'objectKey': key,
+                    'bucket': bucket,
+                    'createdTimestamp': created_timestamp,
+                    'labels': all_labels
+                }
+                
+                logger.debug("Photo document to index: %s", photo_document)
+                
+                photo_documents.append(photo_document)
+        
+        # Step 5: Index in OpenSearch, in a single bulk request when the
+        # event carries more than one record
+        if len(photo_documents) == 1:
+            index_photo(photo_documents[0])
+        elif photo_documents:
+            bulk_index_photos(photo_documents)
+        
+        logger.info("Successfully indexed %d photo(s)", len(photo_documents))
+        
         return {
             'statusCode': 200,
             'body': json.dumps('Photo indexed successfully')
         }
         
     except Exception as e:
-        print(f"Error processing photo: {str(e)}")
+        logger.error("Error processing photo: %s", e)
         return {
             'statusCode': 500,
             'body': json.dumps(f'Error: {str(e)}')
@@ -118,21 +166,23 @@ def detect_labels(bucket, key):
                     'Name': key
                 }
             },
-            MaxLabels=10,
-            MinConfidence=70
+            MaxLabels=REKOGNITION_MAX_LABELS,
+            MinConfidence=REKOGNITION_MIN_CONFIDENCE
         )
         
-        labels = [label['Name'].lower() for label in response['Labels']]
-        return labels
+        return [name.lower() for name in map(_LABEL_NAME, response['Labels'])]
         
     except Exception as e:
-        print(f"Error detecting labels: {str(e)}")
+        logger.error("Error detecting labels: %s", e)
         return []
 
 def get_custom_labels(bucket, key):
     """
     Retrieve custom labels from S3 object metadata.
     Note: The IAM permission s3:GetObject authorizes both GetObject and HeadObject API calls.
+    Uploads go straight from API Gateway to S3 and S3/EventBridge notifications
+    do not carry user metadata, so HeadObject is the only source of these labels;
+    it runs concurrently with Rekognition, keeping it off the critical path.
     Args:
         bucket: S3 bucket name
         key: S3 object key
@@ -145,17 +195,16 @@ def get_custom_labels(bucket, key):
         metadata = response.get('Metadata', {})
         
         # Get custom labels from metadata
-        custom_labels_str = metadata.get('customlabels', '')
+        custom_labels_str = metadata.get('customlabels', '').strip().lower()
         
         if custom_labels_str:
-            # Split comma-separated labels and clean them
-            custom_labels = [label.strip().lower() for label in custom_labels_str.split(',') if label.strip()]
-            return custom_labels
+            # Split comma-separated labels, dropping surrounding whitespace
+            return [label for label in _LABEL_SPLIT_RE.split(custom_labels_str) if label]
         
         return []
         
     except Exception as e:
-        print(f"Error retrieving custom labels: {str(e)}")
+        logger.error("Error retrieving custom labels: %s", e)
         return []
 
 def index_photo(photo_document):
@@ -166,21 +215,50 @@ def index_photo(photo_document):
         photo_document: Dictionary containing photo metadata and labels
     """
     try:
-        opensearch_client = get_opensearch_client()
-        
         # Use objectKey as document ID for idempotency
         doc_id = photo_document['objectKey']
         
-        response = opensearch_client.index(
+        response = _OS_CLIENT.index(
             index=INDEX_NAME,
             id=doc_id,
-            body=photo_document,
-            refresh=True
+            body=photo_document
+        )
+        
+        logger.debug("OpenSearch indexing response: %s", response)
+        
+    except Exception as e:
+        logger.error("Error indexing photo in OpenSearch: %s", e)
+        raise
+
+def bulk_index_photos(photo_documents):
+    """
+    Index multiple photo documents in OpenSearch with one _bulk request.
+    
+    Args:
+        photo_documents: List of dictionaries containing photo metadata and labels
+    """
+    try:
+        # Use objectKey as document ID for idempotency
+        actions = [
+            {
+                '_op_type': 'index',
+                '_index': INDEX_NAME,
+                '_id': photo_document['objectKey'],
+                '_source': photo_document
+            }
+            for photo_document in photo_documents
+        ]
+        
+        success_count, errors = helpers.bulk(
+            _OS_CLIENT,
+            actions,
+            refresh=False,
+            chunk_size=500
         )
         
-        print(f"OpenSearch indexing response: {response}")
+        logger.debug("OpenSearch bulk indexing response: %d indexed, errors: %s", success_count, errors)
         
     except Exception as e:
-        print(f"Error indexing photo in OpenSearch: {str(e)}")
+        logger.error("Error bulk indexing photos in OpenSearch: %s", e)
         raise
 
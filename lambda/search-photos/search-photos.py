@@ -1,10 +1,25 @@
+import functools
 import json
+import logging
 import boto3
+from botocore.config import Config
 import os
-from opensearchpy import OpenSearch, RequestsHttpConnection
-from requests_aws4auth import AWS4Auth
-# Initialize AWS clients
-lex_client = boto3.client('lexv2-runtime')
+
+# Logging; payload dumps are DEBUG so they are skipped unless LOG_LEVEL enables them
+logger = logging.getLogger()
+_log_level = logging.getLevelName(os.environ.get('LOG_LEVEL', 'INFO').upper())
+# getLevelName returns a string for unknown names; fall back to INFO
+logger.setLevel(_log_level if isinstance(_log_level, int) else logging.INFO)
+
+# Shared botocore config: keep sockets alive and allow enough pooled
+# connections for bursty invocations
+_CFG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=50,
+    retries={'mode': 'standard', 'max_attempts': 3},
+    connect_timeout=2,
+    read_timeout=10
+)
 
 # OpenSearch configuration
 OPENSEARCH_HOST = os.environ.get('OPENSEARCH_HOST')
@@ -16,28 +31,49 @@ LEX_BOT_ID = os.environ.get('LEX_BOT_ID')
 LEX_BOT_ALIAS_ID = os.environ.get('LEX_BOT_ALIAS_ID')
 LEX_LOCALE_ID = os.environ.get('LEX_LOCALE_ID', 'en_US')
 
+# Queries of at most this many purely alphabetic words skip Lex and are
+# used as keywords
+FAST_PATH_MAX_TOKENS = 2
+
+# Number of distinct queries whose Lex keywords are kept per container
+LEX_CACHE_SIZE = 1024
+
+# Shared read-only default for hits without a _source
+_EMPTY_SOURCE = {}
+
+# AWS clients are created on first use and then reused by warm invocations,
+# so requests rejected up front (e.g. a missing "q") skip importing
+# opensearchpy and building the clients
+_lex_client = None
+_os_client = None
+
+def get_lex_client():
+    """Return the Lex V2 runtime client, creating it on first use"""
+    global _lex_client
+    if _lex_client is None:
+        _lex_client = boto3.client('lexv2-runtime', config=_CFG)
+    return _lex_client
+
 def get_opensearch_client():
-    """Create and return OpenSearch client with AWS IAM Authentication"""
-    
-    # Get AWS credentials from Lambda execution role
-    credentials = boto3.Session().get_credentials()
-    awsauth = AWS4Auth(
-        credentials.access_key,
-        credentials.secret_key,
-        OPENSEARCH_REGION,
-        'es',
-        session_token=credentials.token
-    )
-    
-    opensearch_client = OpenSearch(
-        hosts=[{'host': OPENSEARCH_HOST, 'port': 443}],
-        http_auth=awsauth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=30
-    )
-    return opensearch_client
+    """Return OpenSearch client with AWS IAM Authentication, creating it on first use"""
+    global _os_client
+    if _os_client is None:
+        from opensearchpy import AWSV4SignerAuth, OpenSearch, RequestsHttpConnection
+        
+        # AWSV4SignerAuth signs with botocore and re-reads rotated role credentials
+        credentials = boto3.Session().get_credentials()
+        awsauth = AWSV4SignerAuth(credentials, OPENSEARCH_REGION, 'es')
+        
+        _os_client = OpenSearch(
+            hosts=[{'host': OPENSEARCH_HOST, 'port': 443}],
+            http_auth=awsauth,
+            use_ssl=True,
+            verify_certs=True,
+            connection_class=RequestsHttpConnection,
+            pool_maxsize=32,
+            timeout=30
+        )
+    return _os_client
 
 def lambda_handler(event, context):
     """
@@ -51,7 +87,7 @@ def lambda_handler(event, context):
     5. Return results
     """
     
-    print(f"Received event: {json.dumps(event)}")
+    logger.debug("Received event: %s", event)
     
     try:
         # Extract query parameter from API Gateway event
@@ -74,16 +110,16 @@ def lambda_handler(event, context):
                 })
             }
         
-        print(f"Search query: {query}")
+        logger.info("Search query: %s", query)
         
         # Step 1: Disambiguate query using Amazon Lex
         keywords = disambiguate_query(query)
-        print(f"Extracted keywords: {keywords}")
+        logger.info("Extracted keywords: %s", keywords)
         
         # Step 2: Search OpenSearch if keywords found
         if keywords:
             results = search_opensearch(keywords)
-            print(f"Search results: {results}")
+            logger.debug("Search results: %s", results)
             
             return {
                 'statusCode': 200,
@@ -113,7 +149,7 @@ def lambda_handler(event, context):
             }
     
     except Exception as e:
-        print(f"Error in lambda_handler: {str(e)}")
+        logger.error("Error in lambda_handler: %s", e)
         return {
             'statusCode': 500,
             'headers': {
@@ -138,47 +174,79 @@ def disambiguate_query(query):
     Returns:
         List of keyword strings
     """
+    # Fast path: short all-letter queries like "dog" come back from Lex
+    # verbatim, so skip the round trip and use the words directly;
+    # anything with digits or punctuation still goes through Lex
+    tokens = query.lower().split()
+    if 1 <= len(tokens) <= FAST_PATH_MAX_TOKENS and all(token.isalpha() for token in tokens):
+        return list(dict.fromkeys(tokens))
+    
     try:
-        # Generate a unique session ID for this request
-        import uuid
-        session_id = str(uuid.uuid4())
-        
-        response = lex_client.recognize_text(
-            botId=LEX_BOT_ID,
-            botAliasId=LEX_BOT_ALIAS_ID,
-            localeId=LEX_LOCALE_ID,
-            sessionId=session_id,
-            text=query
-        )
-        
-        print(f"Lex response: {json.dumps(response, default=str)}")
-        
-        # Extract slots from the response
-        slots = response.get('sessionState', {}).get('intent', {}).get('slots', {})
+        # Cache by normalized text so repeated searches skip Lex entirely
+        return list(_lex_keywords(query.strip().lower()))
         
+    except Exception as e:
+        logger.error("Error disambiguating query with Lex: %s", e)
+        # Fallback: split query by spaces if Lex fails, dropping duplicates
         keywords = []
-        
-        # Extract keyword slots (K1, K2, etc.)
-        # Adjust based on your Lex bot slot names
-        for slot_name, slot_value in slots.items():
-            if slot_value and 'value' in slot_value:
-                resolved_value = slot_value['value'].get('resolvedValues', [])
-                if resolved_value:
-                    keywords.extend([kw.lower() for kw in resolved_value])
-                else:
-                    original_value = slot_value['value'].get('originalValue', '')
-                    if original_value:
-                        keywords.append(original_value.lower())
-        
-        # Remove duplicates while preserving order
-        keywords = list(dict.fromkeys(keywords))
-        
+        seen = set()
+        for word in query.lower().split():
+            if word not in seen:
+                seen.add(word)
+                keywords.append(word)
         return keywords
+
+@functools.lru_cache(maxsize=LEX_CACHE_SIZE)
+def _lex_keywords(normalized_query):
+    """
+    Call Amazon Lex and extract keywords from the recognized slots.
+    
+    Results are cached per execution environment; failed calls raise and
+    are therefore not cached.
+    
+    Args:
+        normalized_query: Stripped, lowercased search query string
         
-    except Exception as e:
-        print(f"Error disambiguating query with Lex: {str(e)}")
-        # Fallback: split query by spaces if Lex fails
-        return [word.strip().lower() for word in query.split() if word.strip()]
+    Returns:
+        Tuple of unique keyword strings
+    """
+    # Generate a unique session ID for this request; a fresh ID keeps Lex
+    # dialog state from one query leaking into the next
+    session_id = os.urandom(16).hex()
+    
+    response = get_lex_client().recognize_text(
+        botId=LEX_BOT_ID,
+        botAliasId=LEX_BOT_ALIAS_ID,
+        localeId=LEX_LOCALE_ID,
+        sessionId=session_id,
+        text=normalized_query
+    )
+    
+    logger.debug("Lex response: %s", response)
+    
+    # Extract slots from the response
+    slots = response.get('sessionState', {}).get('intent', {}).get('slots', {})
+    
+    # Collect unique keywords in order as they are found
+    keywords = []
+    seen = set()
+    add_keyword = keywords.append
+    
+    # Extract keyword slots (K1, K2, etc.)
+    # Adjust based on your Lex bot slot names
+    for slot_name, slot_value in slots.items():
+        if slot_value and 'value' in slot_value:
+            resolved_value = slot_value['value'].get('resolvedValues', [])
+            if not resolved_value:
+                original_value = slot_value['value'].get('originalValue', '')
+                resolved_value = [original_value] if original_value else []
+            for kw in resolved_value:
+                kw = kw.lower()
+                if kw not in seen:
+                    seen.add(kw)
+                    add_keyword(kw)
+    
+    return tuple(keywords)
 
 def search_opensearch(keywords):
     """
@@ -191,49 +259,57 @@ def search_opensearch(keywords):
         List of photo objects with url and labels
     """
     try:
-        opensearch_client = get_opensearch_client()
-        
-        # Build query to match any of the keywords in labels array
+        # Build a single match clause that hits any of the keywords in the
+        # labels array, instead of one clause per keyword
         query = {
             "query": {
-                "bool": {
-                    "should": [
-                        {"match": {"labels": keyword}} for keyword in keywords
-                    ],
-                    "minimum_should_match": 1
+                "match": {
+                    "labels": {
+                        "query": " ".join(keywords),
+                        "operator": "or"
+                    }
                 }
             },
+            "_source": ["bucket", "objectKey", "labels"],
+            "track_total_hits": False,
             "size": 100
         }
         
-        print(f"OpenSearch query: {json.dumps(query)}")
+        logger.debug("OpenSearch query: %s", query)
         
-        response = opensearch_client.search(
+        response = get_opensearch_client().search(
             index=INDEX_NAME,
             body=query
         )
         
-        # Extract results
-        hits = response.get('hits', {}).get('hits', [])
+        # Extract results; a search response always carries hits.hits
+        hits = response['hits']['hits']
         
         results = []
+        url_prefixes = {}
         for hit in hits:
-            source = hit['_source']
+            source = hit.get('_source', _EMPTY_SOURCE)
             bucket = source.get('bucket')
             object_key = source.get('objectKey')
             labels = source.get('labels', [])
             
-            # Generate S3 URL
-            photo_url = f"https://{bucket}.s3.amazonaws.com/{object_key}"
+            # Skip hits that cannot be turned into a photo URL
+            if not object_key:
+                continue
+            
+            # Generate S3 URL, building each bucket's base URL only once
+            url_prefix = url_prefixes.get(bucket)
+            if url_prefix is None:
+                url_prefix = url_prefixes[bucket] = f"https://{bucket}.s3.amazonaws.com/"
             
             results.append({
-                'url': photo_url,
+                'url': url_prefix + object_key,
                 'labels': labels
             })
         
         return results
         
     except Exception as e:
-        print(f"Error searching OpenSearch: {str(e)}")
+        logger.error("Error searching OpenSearch: %s", e)
         return []
 